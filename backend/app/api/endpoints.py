@@ -1,22 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+import asyncio
+import hashlib
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Dict, Any, Tuple, AsyncIterator
+from datetime import datetime, timezone
+import orjson
 import structlog
+from cachetools import TTLCache
 
-from ..database import get_db
+from ..cache import async_ttl_cache
+from ..database import get_db, AsyncSessionLocal
 from ..schemas import (
     AnalysisRequest, AnalysisResponse, TestExecutionRequest, TestExecutionResponse,
-    HealthCheckResponse, CoverageMappingRequest, RepositoryRequest
+    HealthCheckResponse, CoverageMappingRequest, RepositoryRequest,
+    CoverageMappingOut, RepositoryOut
 )
 from ..services.impact_analyzer import impact_analyzer
 from ..services.aws_service import aws_service
-from ..models import CoverageMapping, Repository
+from ..services.cloudwatch_sink import cloudwatch_sink
+from ..models import CoverageMapping, Repository, AnalyzerResult
 from ..config import settings
 
 logger = structlog.get_logger()
 
 router = APIRouter()
 
+# Repository full names known to exist (value is the id when known). Lets a
+# burst of repeated create calls answer 409 without a database round trip.
+_known_repositories: TTLCache = TTLCache(maxsize=1024, ttl=60)
+
 
 @router.post("/analyze", response_model=AnalysisResponse, status_code=status.HTTP_201_CREATED)
 async def analyze_impact(
@@ -49,7 +64,7 @@ async def analyze_impact(
         result = await impact_analyzer.analyze_impact(db, request)
         
         # Log to CloudWatch
-        aws_service.log_to_cloudwatch(
+        cloudwatch_sink.log_nowait(
             f"Impact analysis completed for PR {request.pull_request_id}",
             "INFO",
             {
@@ -62,6 +77,8 @@ async def analyze_impact(
         
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Analysis endpoint error", 
                     repository=request.repository, 
@@ -69,7 +86,7 @@ async def analyze_impact(
                     error=str(e))
         
         # Log error to CloudWatch
-        aws_service.log_to_cloudwatch(
+        cloudwatch_sink.log_nowait(
             f"Analysis failed for PR {request.pull_request_id}: {str(e)}",
             "ERROR",
             {
@@ -114,7 +131,7 @@ async def execute_tests(
         )
         
         # Log to CloudWatch
-        aws_service.log_to_cloudwatch(
+        cloudwatch_sink.log_nowait(
             f"Test execution scheduled for analysis {request.analysis_id}",
             "INFO",
             {
@@ -136,21 +153,29 @@ async def execute_tests(
         )
 
 
+@async_ttl_cache(ttl=5.0)
+async def _check_dependencies_health() -> Tuple[Dict[str, str], str]:
+    """Probe backing services; cached briefly since health checks poll at a high rate"""
+    # Check AWS services health; boto3 blocks, so probe from a worker thread
+    aws_services_status = await asyncio.to_thread(aws_service.check_aws_services_health)
+    
+    # For now, assume database is healthy (in production, you'd check connection)
+    database_status = "healthy"
+    
+    return aws_services_status, database_status
+
+
 @router.get("/health", response_model=HealthCheckResponse)
 async def health_check():
     """
     Health check endpoint for monitoring and load balancer health checks.
     """
     try:
-        # Check AWS services health
-        aws_services_status = aws_service.check_aws_services_health()
-        
-        # For now, assume database is healthy (in production, you'd check connection)
-        database_status = "healthy"
+        aws_services_status, database_status = await _check_dependencies_health()
         
         response = HealthCheckResponse(
             status="healthy",
-            timestamp=aws_service.log_to_cloudwatch("Health check", "INFO"),
+            timestamp=datetime.now(timezone.utc),
             version=settings.APP_VERSION,
             database_status=database_status,
             aws_services_status=aws_services_status
@@ -160,9 +185,11 @@ async def health_check():
         
     except Exception as e:
         logger.error("Health check failed", error=str(e))
+        # Failed probes must not be served from a cache
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Health check failed: {str(e)}"
+            detail=f"Health check failed: {str(e)}",
+            headers={"Cache-Control": "no-store"}
         )
 
 
@@ -175,38 +202,32 @@ async def create_coverage_mapping(
     Create a new coverage mapping between a source file and a test.
     """
     try:
-        # Check if mapping already exists
-        existing = await db.execute(
-            db.query(CoverageMapping).filter(
-                CoverageMapping.file_path == request.file_path,
-                CoverageMapping.test_file_path == request.test_file_path,
-                CoverageMapping.test_function_name == request.test_function_name
-            ).first()
-        )
+        # Insert unless the (file, test file, test function) triplet already exists
+        stmt = pg_insert(CoverageMapping).values(
+            file_path=request.file_path,
+            test_file_path=request.test_file_path,
+            test_function_name=request.test_function_name,
+            coverage_percentage=request.coverage_percentage
+        ).on_conflict_do_nothing(
+            index_elements=["file_path", "test_file_path", "test_function_name"]
+        ).returning(CoverageMapping.id)
+        result = await db.execute(stmt)
+        mapping_id = result.scalar_one_or_none()
         
-        if existing:
+        if mapping_id is None:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Coverage mapping already exists"
             )
         
-        # Create new mapping
-        mapping = CoverageMapping(
-            file_path=request.file_path,
-            test_file_path=request.test_file_path,
-            test_function_name=request.test_function_name,
-            coverage_percentage=request.coverage_percentage
-        )
-        
-        db.add(mapping)
         await db.commit()
-        await db.refresh(mapping)
+        impact_analyzer.invalidate_mappings(request.file_path)
         
         logger.info("Created coverage mapping", 
                    file_path=request.file_path,
                    test_file_path=request.test_file_path)
         
-        return {"id": mapping.id, "message": "Coverage mapping created successfully"}
+        return {"id": mapping_id, "message": "Coverage mapping created successfully"}
         
     except HTTPException:
         raise
@@ -218,34 +239,84 @@ async def create_coverage_mapping(
         )
 
 
-@router.get("/coverage-mappings")
+async def _list_etag(db: AsyncSession, aggregate_stmt, media_type: str = "application/json") -> str:
+    """Build an ETag for a list endpoint from its (max(updated), count) aggregate.
+
+    The negotiated media type is part of the hash so each representation
+    of the same list gets its own ETag.
+    """
+    result = await db.execute(aggregate_stmt)
+    max_updated, count = result.one()
+    digest = hashlib.sha256(f"{max_updated}|{count}|{media_type}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Check the request's If-None-Match header against an ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates or "*" in candidates
+
+
+async def _stream_coverage_mappings(stmt) -> AsyncIterator[bytes]:
+    """Yield coverage mappings as NDJSON lines using a server-side cursor"""
+    # The request-scoped session is closed before a streamed body is sent,
+    # so the cursor gets a session of its own
+    async with AsyncSessionLocal() as session:
+        result = await session.stream_scalars(stmt.execution_options(yield_per=500))
+        async for mapping in result:
+            yield orjson.dumps(CoverageMappingOut.model_validate(mapping).model_dump()) + b"\n"
+
+
+@router.get("/coverage-mappings", response_model=List[CoverageMappingOut])
 async def get_coverage_mappings(
+    request: Request,
+    response: Response,
     file_path: str = None,
     test_file_path: str = None,
     db: AsyncSession = Depends(get_db)
 ):
     """
     Get coverage mappings with optional filtering.
+    
+    Clients sending `Accept: application/x-ndjson` receive one JSON object per
+    line, streamed from the database with bounded memory. Responses carry an
+    ETag; a matching If-None-Match gets 304 without fetching any rows.
     """
     try:
-        query = db.query(CoverageMapping)
+        stmt = select(CoverageMapping)
         
         if file_path:
-            query = query.filter(CoverageMapping.file_path == file_path)
+            stmt = stmt.where(CoverageMapping.file_path == file_path)
         
         if test_file_path:
-            query = query.filter(CoverageMapping.test_file_path == test_file_path)
+            stmt = stmt.where(CoverageMapping.test_file_path == test_file_path)
+        
+        ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+        media_type = "application/x-ndjson" if ndjson else "application/json"
+        
+        etag = await _list_etag(db, stmt.with_only_columns(
+            func.max(CoverageMapping.last_updated), func.count(CoverageMapping.id)
+        ), media_type)
+        # The representation depends on Accept, so caches must key on it too
+        headers = {"ETag": etag, "Vary": "Accept"}
+        if _etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        if ndjson:
+            return StreamingResponse(
+                _stream_coverage_mappings(stmt),
+                media_type=media_type,
+                headers=headers
+            )
         
-        mappings = await db.execute(query.all())
+        result = await db.execute(stmt)
+        mappings = result.scalars().all()
         
-        return [{
-            "id": m.id,
-            "file_path": m.file_path,
-            "test_file_path": m.test_file_path,
-            "test_function_name": m.test_function_name,
-            "coverage_percentage": m.coverage_percentage,
-            "last_updated": m.last_updated
-        } for m in mappings]
+        response.headers.update(headers)
+        return mappings
         
     except Exception as e:
         logger.error("Failed to get coverage mappings", error=str(e))
@@ -264,37 +335,40 @@ async def create_repository(
     Create a new repository record.
     """
     try:
-        # Check if repository already exists
-        existing = await db.execute(
-            db.query(Repository).filter(
-                Repository.full_name == f"{request.owner}/{request.name}"
-            ).first()
-        )
+        full_name = f"{request.owner}/{request.name}"
         
-        if existing:
+        if full_name in _known_repositories:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Repository already exists"
             )
         
-        # Create new repository
-        repo = Repository(
+        # Insert unless a repository with the same name already exists
+        stmt = pg_insert(Repository).values(
             name=request.name,
             owner=request.owner,
-            full_name=f"{request.owner}/{request.name}",
+            full_name=full_name,
             default_branch=request.default_branch,
             language=request.language
-        )
+        ).on_conflict_do_nothing().returning(Repository.id)
+        result = await db.execute(stmt)
+        repo_id = result.scalar_one_or_none()
+        
+        if repo_id is None:
+            _known_repositories[full_name] = None
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Repository already exists"
+            )
         
-        db.add(repo)
         await db.commit()
-        await db.refresh(repo)
+        _known_repositories[full_name] = repo_id
         
         logger.info("Created repository", 
                    owner=request.owner,
                    name=request.name)
         
-        return {"id": repo.id, "message": "Repository created successfully"}
+        return {"id": repo_id, "message": "Repository created successfully"}
         
     except HTTPException:
         raise
@@ -306,24 +380,30 @@ async def create_repository(
         )
 
 
-@router.get("/repositories")
-async def get_repositories(db: AsyncSession = Depends(get_db)):
+@router.get("/repositories", response_model=List[RepositoryOut])
+async def get_repositories(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
+):
     """
     Get all repositories.
+    
+    Responses carry an ETag; a matching If-None-Match gets 304 without
+    fetching any rows.
     """
     try:
-        repos = await db.execute(db.query(Repository).all())
-        
-        return [{
-            "id": r.id,
-            "name": r.name,
-            "owner": r.owner,
-            "full_name": r.full_name,
-            "default_branch": r.default_branch,
-            "language": r.language,
-            "total_tests": r.total_tests,
-            "last_analysis": r.last_analysis
-        } for r in repos]
+        etag = await _list_etag(db, select(
+            func.max(Repository.updated_at), func.count(Repository.id)
+        ))
+        if _etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        
+        result = await db.execute(select(Repository))
+        repos = result.scalars().all()
+        
+        response.headers["ETag"] = etag
+        return repos
         
     except Exception as e:
         logger.error("Failed to get repositories", error=str(e))
@@ -333,23 +413,38 @@ async def get_repositories(db: AsyncSession = Depends(get_db)):
         )
 
 
+@async_ttl_cache(ttl=5.0)
+async def _collect_metrics() -> Dict[str, Any]:
+    """Run the aggregate metric queries; cached briefly for frequent scrapers"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(
+                func.count(AnalyzerResult.id),
+                func.avg(AnalyzerResult.estimated_time_saved),
+                func.avg(AnalyzerResult.risk_score)
+            )
+        )
+        total_analyses, average_time_saved, average_risk_score = result.one()
+        
+        total_repositories = await session.scalar(select(func.count(Repository.id)))
+        total_coverage_mappings = await session.scalar(select(func.count(CoverageMapping.id)))
+    
+    return {
+        "total_analyses": total_analyses,
+        "total_repositories": total_repositories,
+        "total_coverage_mappings": total_coverage_mappings,
+        "average_time_saved": float(average_time_saved or 0.0),
+        "average_risk_score": float(average_risk_score or 0.0)
+    }
+
+
 @router.get("/metrics")
 async def get_metrics():
     """
     Get application metrics for monitoring.
     """
     try:
-        # This would typically query the database for metrics
-        # For now, return basic metrics
-        metrics = {
-            "total_analyses": 0,  # Would query AnalyzerResult count
-            "total_repositories": 0,  # Would query Repository count
-            "total_coverage_mappings": 0,  # Would query CoverageMapping count
-            "average_time_saved": 0.0,  # Would calculate from AnalyzerResult
-            "average_risk_score": 0.0  # Would calculate from AnalyzerResult
-        }
-        
-        return metrics
+        return await _collect_metrics()
         
     except Exception as e:
         logger.error("Failed to get metrics", error=str(e))
@@ -0,0 +1,39 @@
+import asyncio
+import functools
+import time
+from typing import Any, Callable, Dict, Tuple
+
+
+def async_ttl_cache(ttl: float) -> Callable:
+    """Cache the result of a coroutine function for ``ttl`` seconds.
+
+    Results are keyed by call arguments. Concurrent callers that miss share
+    the same in-flight call, and failed calls are not cached.
+    """
+    def decorator(func: Callable) -> Callable:
+        cache: Dict[Any, Tuple[float, asyncio.Future]] = {}
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+
+            entry = cache.get(key)
+            if entry is None or entry[0] <= now:
+                task = asyncio.ensure_future(func(*args, **kwargs))
+                cache[key] = (now + ttl, task)
+
+                def _evict_on_error(done: asyncio.Future, key=key):
+                    if done.cancelled() or done.exception() is not None:
+                        if cache.get(key, (None, None))[1] is done:
+                            del cache[key]
+
+                task.add_done_callback(_evict_on_error)
+                entry = cache[key]
+
+            return await asyncio.shield(entry[1])
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
\ No newline at end of file
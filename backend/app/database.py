@@ -1,15 +1,35 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from sqlalchemy import MetaData
-from .config import get_database_url
+import orjson
+from .config import settings, get_database_url
+
+# Pool sizing; an external pooler (PgBouncer) owns the connections instead
+if settings.DB_USE_NULL_POOL:
+    pool_options = {"poolclass": NullPool}
+else:
+    pool_options = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
 
 # Create async engine
 engine = create_async_engine(
     get_database_url().replace("postgresql://", "postgresql+asyncpg://"),
     echo=False,
     pool_pre_ping=True,
-    pool_recycle=300,
+    # JSON columns are encoded/decoded with orjson
+    json_serializer=lambda value: orjson.dumps(value).decode(),
+    json_deserializer=orjson.loads,
+    connect_args={
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    },
+    **pool_options,
 )
 
 # Create async session factory
@@ -1,36 +1,46 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+import logging
 import structlog
 import time
 from contextlib import asynccontextmanager
 
 from .api.endpoints import router
+from .middleware import ZstdMiddleware
 from .database import init_db, close_db
 from .config import settings
-from .services.aws_service import aws_service
+from .services.cloudwatch_sink import cloudwatch_sink
+from .services.request_metrics import request_metrics
+from .services.result_buffer import analyzer_results
 
 # Configure structured logging
+LOG_LEVEL = logging.DEBUG if settings.DEBUG else logging.INFO
+
+logging.basicConfig(format="%(message)s", level=LOG_LEVEL)
+
+# Level filtering happens in the bound logger itself, so disabled levels are
+# no-ops and no processor chain runs for them. Stack rendering is left out
+# since no call site passes stack_info; format_exc_info only does work when
+# exc_info is passed (the global exception handler).
 structlog.configure(
     processors=[
-        structlog.stdlib.filter_by_level,
         structlog.stdlib.add_logger_name,
         structlog.stdlib.add_log_level,
         structlog.stdlib.PositionalArgumentsFormatter(),
         structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
         structlog.processors.UnicodeDecoder(),
         structlog.processors.JSONRenderer()
     ],
     context_class=dict,
     logger_factory=structlog.stdlib.LoggerFactory(),
-    wrapper_class=structlog.stdlib.BoundLogger,
+    wrapper_class=structlog.make_filtering_bound_logger(LOG_LEVEL),
     cache_logger_on_first_use=True,
 )
 
-logger = structlog.get_logger()
+logger = structlog.get_logger().bind(service="impact-analyzer")
 
 
 @asynccontextmanager
@@ -44,8 +54,15 @@ async def lifespan(app: FastAPI):
         await init_db()
         logger.info("Database initialized successfully")
         
+        # Start batched analysis result writes
+        analyzer_results.start()
+        
+        # Start background CloudWatch shipping
+        cloudwatch_sink.start()
+        request_metrics.start()
+        
         # Log startup to CloudWatch
-        aws_service.log_to_cloudwatch(
+        cloudwatch_sink.log_nowait(
             f"Application started - version {settings.APP_VERSION}",
             "INFO",
             {"service": "impact-analyzer-backend", "version": settings.APP_VERSION}
@@ -59,14 +76,18 @@ async def lifespan(app: FastAPI):
     finally:
         # Shutdown
         logger.info("Shutting down AI Driven Impact Analyzer")
+        # Write queued analysis results before the engine is disposed
+        await analyzer_results.stop()
         await close_db()
         
-        # Log shutdown to CloudWatch
-        aws_service.log_to_cloudwatch(
+        # Log shutdown to CloudWatch and flush pending records
+        cloudwatch_sink.log_nowait(
             "Application shutting down",
             "INFO",
             {"service": "impact-analyzer-backend"}
         )
+        await request_metrics.stop()
+        await cloudwatch_sink.stop()
 
 
 # Create FastAPI application
@@ -76,42 +97,37 @@ app = FastAPI(
     version=settings.APP_VERSION,
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
 # Add middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
+    allow_origins=[origin.strip() for origin in settings.ALLOWED_ORIGINS.split(",") if origin.strip()],
+    allow_origin_regex=settings.ALLOWED_ORIGIN_REGEX,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["authorization", "content-type", "if-none-match"],
+    expose_headers=["ETag", "X-Process-Time"],
 )
 
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
+# Added last so it wraps GZip: zstd-capable clients skip the gzip path
+app.add_middleware(ZstdMiddleware, minimum_size=1024, level=3)
+
 
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     """Add processing time header to responses"""
-    start_time = time.time()
+    start_ns = time.perf_counter_ns()
     response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
+    elapsed_ns = time.perf_counter_ns() - start_ns
+    response.headers["X-Process-Time"] = str(elapsed_ns)
     
-    # Log request metrics to CloudWatch
-    try:
-        aws_service.put_metric("RequestDuration", process_time, "Seconds", [
-            {"Name": "Endpoint", "Value": request.url.path},
-            {"Name": "Method", "Value": request.method}
-        ])
-        
-        aws_service.put_metric("RequestCount", 1, "Count", [
-            {"Name": "Endpoint", "Value": request.url.path},
-            {"Name": "Method", "Value": request.method}
-        ])
-    except Exception as e:
-        logger.warning("Failed to log metrics to CloudWatch", error=str(e))
+    # Aggregate request metrics; flushed to CloudWatch periodically
+    request_metrics.record(request.url.path, request.method, elapsed_ns / 1e9)
     
     return response
 
@@ -126,20 +142,17 @@ async def global_exception_handler(request: Request, exc: Exception):
                 exc_info=True)
     
     # Log error to CloudWatch
-    try:
-        aws_service.log_to_cloudwatch(
-            f"Unhandled exception: {str(exc)}",
-            "ERROR",
-            {
-                "path": str(request.url.path),
-                "method": request.method,
-                "error": str(exc)
-            }
-        )
-    except Exception as e:
-        logger.warning("Failed to log error to CloudWatch", error=str(e))
+    cloudwatch_sink.log_nowait(
+        f"Unhandled exception: {str(exc)}",
+        "ERROR",
+        {
+            "path": str(request.url.path),
+            "method": request.method,
+            "error": str(exc)
+        }
+    )
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": "Internal server error",
@@ -171,6 +184,7 @@ async def ping():
 
 
 if __name__ == "__main__":
+    import os
     import uvicorn
     
     uvicorn.run(
@@ -178,5 +192,9 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=settings.DEBUG,
-        log_level="info"
+        log_level="info",
+        loop="uvloop",
+        http="httptools",
+        # reload only supports a single worker
+        workers=1 if settings.DEBUG else (os.cpu_count() or 1) * 2 + 1
     ) 
\ No newline at end of file
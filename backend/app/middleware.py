@@ -0,0 +1,132 @@
+import zstandard
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+def _dedupe_vary(message: Message) -> Message:
+    """Collapse Vary into one header with each token once, compared case-insensitively.
+
+    Inner middleware such as GZip appends Accept-Encoding without checking
+    for it, so tokens can arrive duplicated.
+    """
+    headers = MutableHeaders(raw=message["headers"])
+    tokens = {}
+    for value in headers.getlist("vary"):
+        for token in value.split(","):
+            token = token.strip()
+            if token:
+                tokens.setdefault(token.lower(), token)
+    if tokens:
+        del headers["vary"]
+        headers["Vary"] = ", ".join(tokens.values())
+        message["headers"] = headers.raw
+    return message
+
+
+class ZstdMiddleware:
+    """Compress responses with zstd for clients that accept it.
+
+    Requests that do not advertise zstd pass through untouched, so an inner
+    GZipMiddleware still serves gzip-only clients.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, level: int = 3) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        # One-shot compression runs on the event loop thread, so a single
+        # compressor can be shared between requests
+        self.compressor = zstandard.ZstdCompressor(level=level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            if "zstd" in headers.get("Accept-Encoding", ""):
+                # Hide Accept-Encoding from inner middleware so the body is only compressed once
+                scope = dict(scope)
+                scope["headers"] = [
+                    (key, value) for key, value in scope["headers"] if key != b"accept-encoding"
+                ]
+                responder = ZstdResponder(self.app, self.compressor, self.minimum_size, self.level)
+                await responder(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
+
+
+class ZstdResponder:
+    """Per-response state for ZstdMiddleware"""
+
+    def __init__(self, app: ASGIApp, compressor: zstandard.ZstdCompressor,
+                 minimum_size: int, level: int) -> None:
+        self.app = app
+        self.compressor = compressor
+        self.minimum_size = minimum_size
+        self.level = level
+        self.send: Send = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.content_encoding_set = False
+        self.stream = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def send_with_compression(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Hold the start message until the first body chunk shows whether to compress
+            self.initial_message = message
+            headers = Headers(raw=self.initial_message["headers"])
+            self.content_encoding_set = "content-encoding" in headers
+
+        elif message_type == "http.response.body" and self.content_encoding_set:
+            if not self.started:
+                self.started = True
+                await self.send(_dedupe_vary(self.initial_message))
+            await self.send(message)
+
+        elif message_type == "http.response.body" and not self.started:
+            self.started = True
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if len(body) < self.minimum_size and not more_body:
+                await self.send(_dedupe_vary(self.initial_message))
+                await self.send(message)
+                return
+
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = "zstd"
+            headers.add_vary_header("Accept-Encoding")
+
+            if not more_body:
+                # Whole body available: compress in one shot
+                message["body"] = self.compressor.compress(body)
+                headers["Content-Length"] = str(len(message["body"]))
+            else:
+                # Streaming body: compress incrementally, flushing each chunk
+                del headers["Content-Length"]
+                self.stream = zstandard.ZstdCompressor(level=self.level).compressobj()
+                message["body"] = (self.stream.compress(body)
+                                   + self.stream.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK))
+
+            await self.send(_dedupe_vary(self.initial_message))
+            await self.send(message)
+
+        elif message_type == "http.response.body":
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if more_body:
+                message["body"] = (self.stream.compress(body)
+                                   + self.stream.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK))
+            else:
+                message["body"] = self.stream.compress(body) + self.stream.flush()
+
+            await self.send(message)
+
+        else:
+            await self.send(message)
\ No newline at end of file
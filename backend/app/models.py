@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -7,9 +7,13 @@ from .database import Base
 class CoverageMapping(Base):
     """Maps files to their related tests"""
     __tablename__ = "coverage_mappings"
+    __table_args__ = (
+        # Backs the existence check on create; also serves file_path-only lookups
+        UniqueConstraint("file_path", "test_file_path", "test_function_name", name="uq_coverage_triplet"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    file_path = Column(String(500), nullable=False, index=True)
+    file_path = Column(String(500), nullable=False)
     test_file_path = Column(String(500), nullable=False, index=True)
     test_function_name = Column(String(200), nullable=False)
     coverage_percentage = Column(Float, default=0.0)
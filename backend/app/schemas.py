@@ -1,17 +1,21 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
 
 
 class ChangedFile(BaseModel):
     """Represents a changed file in a pull request"""
-    file_path: str = Field(..., description="Path to the changed file")
-    change_type: str = Field(..., description="Type of change: added, modified, deleted")
+    model_config = ConfigDict(extra="forbid", frozen=True)
+    
+    file_path: str = Field(..., strict=True, description="Path to the changed file")
+    change_type: Literal["added", "modified", "deleted"] = Field(..., description="Type of change: added, modified, deleted")
     lines_changed: Optional[int] = Field(None, description="Number of lines changed")
 
 
 class AnalysisRequest(BaseModel):
     """Request model for impact analysis"""
+    model_config = ConfigDict(extra="forbid", frozen=True)
+    
     repository: str = Field(..., description="Repository name (owner/repo)")
     pull_request_id: str = Field(..., description="Pull request ID or number")
     changed_files: List[ChangedFile] = Field(..., description="List of changed files")
@@ -92,9 +96,35 @@ class CoverageMappingRequest(BaseModel):
     coverage_percentage: float = Field(..., description="Coverage percentage")
 
 
+class CoverageMappingOut(BaseModel):
+    """Response model for a stored coverage mapping"""
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int = Field(..., description="Coverage mapping ID")
+    file_path: str = Field(..., description="Path to the source file")
+    test_file_path: str = Field(..., description="Path to the test file")
+    test_function_name: str = Field(..., description="Name of the test function")
+    coverage_percentage: Optional[float] = Field(None, description="Coverage percentage")
+    last_updated: Optional[datetime] = Field(None, description="When the mapping was last updated")
+
+
 class RepositoryRequest(BaseModel):
     """Request model for repository operations"""
     name: str = Field(..., description="Repository name")
     owner: str = Field(..., description="Repository owner")
     default_branch: str = Field("main", description="Default branch")
-    language: Optional[str] = Field(None, description="Primary programming language") 
\ No newline at end of file
+    language: Optional[str] = Field(None, description="Primary programming language") 
+
+
+class RepositoryOut(BaseModel):
+    """Response model for a stored repository"""
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int = Field(..., description="Repository ID")
+    name: str = Field(..., description="Repository name")
+    owner: str = Field(..., description="Repository owner")
+    full_name: str = Field(..., description="Full repository name (owner/repo)")
+    default_branch: Optional[str] = Field(None, description="Default branch")
+    language: Optional[str] = Field(None, description="Primary programming language")
+    total_tests: Optional[int] = Field(None, description="Total number of tests in repository")
+    last_analysis: Optional[datetime] = Field(None, description="When the repository was last analyzed")
\ No newline at end of file
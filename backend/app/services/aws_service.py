@@ -1,16 +1,30 @@
 import boto3
-import json
+import io
 import logging
+import orjson
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
 from typing import Dict, Any, Optional, List
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 from ..config import settings
 import structlog
 
 logger = structlog.get_logger()
 
+# Maximum metric datums sent per PutMetricData call
+METRIC_BATCH_SIZE = 20
+
 
 class AWSService:
-    """Service class for AWS operations"""
+    """Service class for AWS operations.
+    
+    Clients and their connection pools are created once per instance; use the
+    module-level ``aws_service`` rather than constructing one per request.
+    """
     
     def __init__(self):
         self.region = settings.AWS_REGION
@@ -20,27 +34,62 @@ class AWSService:
             aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
         )
         
+        # Telemetry calls are best-effort: keep pooled, kept-alive connections
+        # and fail fast rather than retrying at length
+        telemetry_config = Config(
+            retries={'max_attempts': 2, 'mode': 'adaptive'},
+            max_pool_connections=50,
+            tcp_keepalive=True,
+            connect_timeout=1.0,
+            read_timeout=2.0
+        )
+        
+        # Shared pool sized for concurrent uploads; S3 transfers need longer reads
+        client_config = Config(
+            retries={'max_attempts': 3, 'mode': 'adaptive'},
+            max_pool_connections=50,
+            tcp_keepalive=True,
+            connect_timeout=3,
+            read_timeout=30
+        )
+        
         # Initialize AWS clients
-        self.s3_client = self.session.client('s3')
-        self.cloudwatch_client = self.session.client('cloudwatch')
-        self.cloudwatch_logs_client = self.session.client('logs')
-        self.rds_client = self.session.client('rds')
+        self.s3_client = self.session.client('s3', config=client_config)
+        self.cloudwatch_client = self.session.client('cloudwatch', config=telemetry_config)
+        self.cloudwatch_logs_client = self.session.client('logs', config=telemetry_config)
+        self.rds_client = self.session.client('rds', config=client_config)
         
         # S3 bucket configuration
         self.s3_bucket = settings.S3_BUCKET_NAME
+        # Reports above 8 MiB upload as parallel multipart parts
+        self._transfer_config = TransferConfig(
+            multipart_threshold=8 * 1024 ** 2,
+            multipart_chunksize=8 * 1024 ** 2,
+            max_concurrency=10,
+            use_threads=True
+        )
         
         # CloudWatch configuration
         self.log_group = settings.CLOUDWATCH_LOG_GROUP
         self.log_stream = settings.CLOUDWATCH_LOG_STREAM
+        self._sequence_token: Optional[str] = None
+        self._log_lock = threading.Lock()
         
-        # Ensure S3 bucket exists
-        self._ensure_s3_bucket_exists()
+        # Ensure S3 bucket exists (normally provisioned by the infrastructure stack)
+        if settings.ENSURE_S3_BUCKET:
+            self._ensure_s3_bucket_exists()
     
     def _ensure_s3_bucket_exists(self):
         """Ensure S3 bucket exists, create if it doesn't"""
+        # Remember a successful check so restarted workers skip the round trip
+        marker = os.path.join(tempfile.gettempdir(), f".s3_bucket_ok_{self.s3_bucket}")
+        if os.path.exists(marker):
+            return
+        
         try:
             self.s3_client.head_bucket(Bucket=self.s3_bucket)
             logger.info("S3 bucket exists", bucket=self.s3_bucket)
+            open(marker, "w").close()
         except ClientError as e:
             if e.response['Error']['Code'] == '404':
                 try:
@@ -49,6 +98,7 @@ class AWSService:
                         CreateBucketConfiguration={'LocationConstraint': self.region}
                     )
                     logger.info("Created S3 bucket", bucket=self.s3_bucket)
+                    open(marker, "w").close()
                 except ClientError as create_error:
                     logger.error("Failed to create S3 bucket", 
                                bucket=self.s3_bucket, error=str(create_error))
@@ -62,26 +112,32 @@ class AWSService:
             key = f"coverage-reports/{analysis_id}/report.{file_extension}"
             
             if file_extension == "json":
-                content = json.dumps(report_data, indent=2)
+                content = orjson.dumps(report_data)
                 content_type = "application/json"
             else:
                 content = report_data
                 content_type = "text/plain"
             
-            self.s3_client.put_object(
+            if isinstance(content, str):
+                content = content.encode()
+            
+            self.s3_client.upload_fileobj(
+                Fileobj=io.BytesIO(content),
                 Bucket=self.s3_bucket,
                 Key=key,
-                Body=content,
-                ContentType=content_type,
-                Metadata={
-                    'analysis_id': analysis_id,
-                    'uploaded_at': str(json.dumps({'timestamp': 'now'}))
-                }
+                ExtraArgs={
+                    'ContentType': content_type,
+                    'Metadata': {
+                        'analysis_id': analysis_id,
+                        'uploaded_at': datetime.now(timezone.utc).isoformat()
+                    }
+                },
+                Config=self._transfer_config
             )
             
             url = f"https://{self.s3_bucket}.s3.{self.region}.amazonaws.com/{key}"
-            logger.info("Uploaded coverage report to S3", 
-                       analysis_id=analysis_id, url=url)
+            logger.debug("Uploaded coverage report to S3", 
+                        analysis_id=analysis_id, url=url)
             
             return url
             
@@ -96,21 +152,24 @@ class AWSService:
         try:
             key = f"test-artifacts/{analysis_id}/{workflow_run_id}/artifacts.json"
             
-            self.s3_client.put_object(
+            self.s3_client.upload_fileobj(
+                Fileobj=io.BytesIO(orjson.dumps(artifacts)),
                 Bucket=self.s3_bucket,
                 Key=key,
-                Body=json.dumps(artifacts, indent=2),
-                ContentType="application/json",
-                Metadata={
-                    'analysis_id': analysis_id,
-                    'workflow_run_id': workflow_run_id,
-                    'uploaded_at': str(json.dumps({'timestamp': 'now'}))
-                }
+                ExtraArgs={
+                    'ContentType': "application/json",
+                    'Metadata': {
+                        'analysis_id': analysis_id,
+                        'workflow_run_id': workflow_run_id,
+                        'uploaded_at': datetime.now(timezone.utc).isoformat()
+                    }
+                },
+                Config=self._transfer_config
             )
             
             url = f"https://{self.s3_bucket}.s3.{self.region}.amazonaws.com/{key}"
-            logger.info("Uploaded test artifacts to S3", 
-                       analysis_id=analysis_id, workflow_run_id=workflow_run_id, url=url)
+            logger.debug("Uploaded test artifacts to S3", 
+                        analysis_id=analysis_id, workflow_run_id=workflow_run_id, url=url)
             
             return url
             
@@ -119,60 +178,47 @@ class AWSService:
                         analysis_id=analysis_id, workflow_run_id=workflow_run_id, error=str(e))
             raise
     
-    def log_to_cloudwatch(self, message: str, log_level: str = "INFO", 
-                          additional_data: Optional[Dict[str, Any]] = None):
-        """Log message to CloudWatch"""
+    def put_log_events(self, log_events: List[Dict[str, Any]]):
+        """Send a batch of log events to CloudWatch Logs"""
         try:
-            log_data = {
-                'message': message,
-                'level': log_level,
-                'timestamp': str(json.dumps({'timestamp': 'now'})),
-                'service': 'impact-analyzer-backend'
-            }
-            
-            if additional_data:
-                log_data.update(additional_data)
-            
-            log_event = {
-                'timestamp': int(json.dumps({'timestamp': 'now'}) * 1000),
-                'message': json.dumps(log_data)
-            }
-            
-            self.cloudwatch_logs_client.put_log_events(
-                logGroupName=self.log_group,
-                logStreamName=self.log_stream,
-                logEvents=[log_event]
-            )
+            # The sequence token is shared state, so batches go out one at a time
+            with self._log_lock:
+                try:
+                    self._put_log_events_with_token(log_events)
+                except ClientError as e:
+                    if e.response['Error']['Code'] != 'InvalidSequenceTokenException':
+                        raise
+                    # Another writer advanced the stream; retry once with the expected token
+                    self._sequence_token = e.response.get('expectedSequenceToken')
+                    self._put_log_events_with_token(log_events)
             
         except Exception as e:
-            logger.error("Failed to log to CloudWatch", error=str(e))
+            logger.error("Failed to log batch to CloudWatch", 
+                        events=len(log_events), error=str(e))
     
-    def put_metric(self, metric_name: str, value: float, unit: str = "Count",
-                   dimensions: Optional[List[Dict[str, str]]] = None):
-        """Put custom metric to CloudWatch"""
+    def _put_log_events_with_token(self, log_events: List[Dict[str, Any]]):
+        kwargs = {
+            'logGroupName': self.log_group,
+            'logStreamName': self.log_stream,
+            'logEvents': log_events
+        }
+        if self._sequence_token:
+            kwargs['sequenceToken'] = self._sequence_token
+        
+        response = self.cloudwatch_logs_client.put_log_events(**kwargs)
+        self._sequence_token = response.get('nextSequenceToken')
+    
+    def put_metric_data(self, metric_data: List[Dict[str, Any]]):
+        """Send a batch of metric datums to CloudWatch"""
         try:
-            metric_data = {
-                'MetricName': metric_name,
-                'Value': value,
-                'Unit': unit,
-                'Timestamp': json.dumps({'timestamp': 'now'}),
-                'Namespace': 'ImpactAnalyzer'
-            }
-            
-            if dimensions:
-                metric_data['Dimensions'] = dimensions
-            
             self.cloudwatch_client.put_metric_data(
                 Namespace='ImpactAnalyzer',
-                MetricData=[metric_data]
+                MetricData=metric_data
             )
             
-            logger.info("Put metric to CloudWatch", 
-                       metric_name=metric_name, value=value, unit=unit)
-            
         except Exception as e:
-            logger.error("Failed to put metric to CloudWatch", 
-                        metric_name=metric_name, error=str(e))
+            logger.error("Failed to put metric batch to CloudWatch", 
+                        metrics=len(metric_data), error=str(e))
     
     def check_aws_services_health(self) -> Dict[str, str]:
         """Check health of AWS services"""
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List
+import structlog
+
+from .aws_service import aws_service, METRIC_BATCH_SIZE
+
+logger = structlog.get_logger()
+
+# PutLogEvents accepts 10,000 events / 1 MiB per call, counting 26 bytes of
+# overhead per event. Batches close below the byte limit with room for one
+# more maximum-size (256 KiB) event.
+LOG_BATCH_MAX_EVENTS = 10000
+LOG_BATCH_MAX_BYTES = 768 * 1024
+LOG_EVENT_OVERHEAD = 26
+
+
+class _Batch:
+    """Log events and metric datums collected for one flush"""
+
+    def __init__(self):
+        self.log_events: List[Dict[str, Any]] = []
+        self.log_bytes = 0
+        self.metric_data: List[Dict[str, Any]] = []
+
+    def add(self, item: tuple):
+        if item[0] == "log":
+            # json.dumps escapes non-ASCII, so the length is the byte size
+            message = json.dumps(item[2])
+            self.log_events.append({'timestamp': item[1], 'message': message})
+            self.log_bytes += len(message) + LOG_EVENT_OVERHEAD
+        else:
+            self.metric_data.append(item[1])
+
+    def full(self) -> bool:
+        return (len(self.log_events) >= LOG_BATCH_MAX_EVENTS
+                or self.log_bytes >= LOG_BATCH_MAX_BYTES
+                or len(self.metric_data) >= METRIC_BATCH_SIZE)
+
+
+class CloudWatchSink:
+    """Background shipper for CloudWatch logs and metrics.
+
+    Request handlers only enqueue records; a task started in the application
+    lifespan batches them and sends them to CloudWatch off the event loop.
+    """
+
+    def __init__(self, maxsize: int = 10000, flush_interval: float = 1.0):
+        self.maxsize = maxsize
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background drain task"""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Flush pending records and stop the background task"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    def log_nowait(self, message: str, log_level: str = "INFO",
+                   additional_data: Optional[Dict[str, Any]] = None):
+        """Enqueue a log message, dropping it if the queue is full"""
+        log_data = {
+            'message': message,
+            'level': log_level,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'service': 'impact-analyzer-backend'
+        }
+
+        if additional_data:
+            log_data.update(additional_data)
+
+        self._put_nowait(("log", int(time.time() * 1000), log_data))
+
+    def metric_nowait(self, metric_name: str, value: float, unit: str = "Count",
+                      dimensions: Optional[List[Dict[str, str]]] = None):
+        """Enqueue a metric datum, dropping it if the queue is full"""
+        metric_data = {
+            'MetricName': metric_name,
+            'Value': value,
+            'Unit': unit,
+            'Timestamp': datetime.now(timezone.utc)
+        }
+
+        if dimensions:
+            metric_data['Dimensions'] = dimensions
+
+        self._put_nowait(("metric", metric_data))
+
+    def _put_nowait(self, item: tuple):
+        if self._queue is None:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def run(self):
+        """Collect batches from the queue and ship them until stopped"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            batch = _Batch()
+            deadline = loop.time() + self.flush_interval
+
+            while True:
+                batch.add(item)
+                if batch.full():
+                    break
+
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+
+            await self._flush(batch)
+
+        # Ship anything still queued behind the stop sentinel
+        batch = _Batch()
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is None:
+                continue
+            batch.add(item)
+            if batch.full():
+                await self._flush(batch)
+                batch = _Batch()
+        await self._flush(batch)
+
+    async def _flush(self, batch: _Batch):
+        try:
+            if batch.log_events:
+                await asyncio.to_thread(aws_service.put_log_events, batch.log_events)
+
+            if batch.metric_data:
+                await asyncio.to_thread(aws_service.put_metric_data, batch.metric_data)
+        except Exception as e:
+            logger.error("Failed to ship CloudWatch batch", error=str(e))
+
+
+# Global CloudWatch sink instance
+cloudwatch_sink = CloudWatchSink()
\ No newline at end of file
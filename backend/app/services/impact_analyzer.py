@@ -1,17 +1,61 @@
+import asyncio
+import heapq
+import time
 import uuid
 import json
-from typing import List, Dict, Any, Tuple
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Tuple, NamedTuple
+from cachetools import TTLCache
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased
 import structlog
 
-from ..models import CoverageMapping, TestHistory, AnalyzerResult, Repository
+from ..database import AsyncSessionLocal
+from ..models import CoverageMapping, TestHistory, Repository
 from ..schemas import AnalysisRequest, TestInfo, AnalysisResponse
-from ..services.aws_service import aws_service
+from ..services.cloudwatch_sink import cloudwatch_sink
+from ..services.result_buffer import analyzer_results
 
 logger = structlog.get_logger()
 
+class MappingSnapshot(NamedTuple):
+    """Detached copy of the CoverageMapping columns used during analysis"""
+    id: int
+    file_path: str
+    test_file_path: str
+    test_function_name: str
+    coverage_percentage: float
+
+
+@dataclass(slots=True)
+class _TestInfoRaw:
+    """Selected test as built and scored in-process; converted to TestInfo at the API boundary"""
+    test_file_path: str
+    test_function_name: str
+    coverage_percentage: float
+    estimated_execution_time: float
+    priority: str
+    reason: str
+    weight: float
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """JSON-ready representation stored on AnalyzerResult"""
+        return {
+            'test_file_path': self.test_file_path,
+            'test_function_name': self.test_function_name,
+            'coverage_percentage': self.coverage_percentage,
+            'estimated_execution_time': self.estimated_execution_time,
+            'priority': self.priority,
+            'reason': self.reason
+        }
+    
+    def to_schema(self) -> TestInfo:
+        """API model, constructed without re-validating values built here"""
+        return TestInfo.model_construct(**self.as_dict())
+
 
 class ImpactAnalyzer:
     """Core service for analyzing impact of code changes and selecting relevant tests"""
@@ -22,16 +66,26 @@ class ImpactAnalyzer:
             'medium': 0.5,
             'low': 0.2
         }
+        # Coverage mappings per source file, reused across analyses
+        self._mapping_cache: TTLCache = TTLCache(maxsize=10000, ttl=300)
+        # Distinct test file count and when it was fetched; refreshed every minute
+        self._total_tests_cache: Tuple[int, float] = (0, float("-inf"))
+        self._total_tests_lock = asyncio.Lock()
+    
+    def invalidate_mappings(self, file_path: str):
+        """Drop cached coverage mappings for a source file"""
+        self._mapping_cache.pop(file_path, None)
     
     async def analyze_impact(self, db: AsyncSession, request: AnalysisRequest) -> AnalysisResponse:
         """Analyze the impact of changed files and select relevant tests"""
+        # Generate unique analysis ID and bind the request context once
+        analysis_id = str(uuid.uuid4())
+        log = logger.bind(analysis_id=analysis_id,
+                          repository=request.repository,
+                          pull_request_id=request.pull_request_id)
+        
         try:
-            logger.info("Starting impact analysis", 
-                       repository=request.repository, 
-                       pull_request_id=request.pull_request_id)
-            
-            # Generate unique analysis ID
-            analysis_id = str(uuid.uuid4())
+            log.debug("Starting impact analysis")
             
             # Get repository info
             repo = await self._get_or_create_repository(db, request.repository)
@@ -40,129 +94,165 @@ class ImpactAnalyzer:
             selected_tests, total_tests = await self._find_related_tests(db, request.changed_files)
             
             # Calculate metrics
-            estimated_time_saved = await self._calculate_time_saved(db, selected_tests, total_tests)
-            risk_score = self._calculate_risk_score(selected_tests, request.changed_files)
-            confidence_score = self._calculate_confidence_score(selected_tests, request.changed_files)
+            estimated_time_saved = self._calculate_time_saved(selected_tests, total_tests)
+            risk_score, confidence_score, high_priority = self._score_all(
+                selected_tests, len(request.changed_files)
+            )
             
             # Generate analysis reasoning
             analysis_reasoning = self._generate_analysis_reasoning(
-                selected_tests, request.changed_files, risk_score, confidence_score
+                len(selected_tests), len(request.changed_files), high_priority,
+                risk_score, confidence_score
             )
             
-            # Create analysis result
-            analysis_result = AnalyzerResult(
+            # Queue the analysis result for the batched background insert
+            created_at = datetime.now(timezone.utc)
+            await analyzer_results.add(dict(
                 analysis_id=analysis_id,
                 pull_request_id=request.pull_request_id,
                 repository=request.repository,
                 changed_files=[file.file_path for file in request.changed_files],
-                selected_tests=[test.dict() for test in selected_tests],
+                selected_tests=[test.as_dict() for test in selected_tests],
                 estimated_time_saved=estimated_time_saved,
                 risk_score=risk_score,
                 analysis_reasoning=analysis_reasoning,
                 total_tests_in_repo=total_tests,
                 tests_selected_count=len(selected_tests),
-                confidence_score=confidence_score
-            )
-            
-            db.add(analysis_result)
-            await db.commit()
-            
-            # Log metrics to CloudWatch
-            aws_service.put_metric("AnalysisCompleted", 1, "Count", [
-                {"Name": "Repository", "Value": request.repository},
-                {"Name": "AnalysisID", "Value": analysis_id}
-            ])
-            
-            aws_service.put_metric("TestsSelected", len(selected_tests), "Count", [
-                {"Name": "Repository", "Value": request.repository}
-            ])
-            
-            aws_service.put_metric("TimeSaved", estimated_time_saved, "Minutes", [
-                {"Name": "Repository", "Value": request.repository}
-            ])
+                confidence_score=confidence_score,
+                created_at=created_at
+            ))
+            
+            # Queue metrics for the background CloudWatch sink so the response
+            # does not wait on CloudWatch. Analyses with no covered files have
+            # nothing to report.
+            if selected_tests:
+                cloudwatch_sink.metric_nowait("AnalysisCompleted", 1, "Count", [
+                    {"Name": "Repository", "Value": request.repository},
+                    {"Name": "AnalysisID", "Value": analysis_id}
+                ])
+                
+                cloudwatch_sink.metric_nowait("TestsSelected", len(selected_tests), "Count", [
+                    {"Name": "Repository", "Value": request.repository}
+                ])
+                
+                # CloudWatch has no minutes unit; an invalid unit rejects the whole batch
+                cloudwatch_sink.metric_nowait("TimeSaved", estimated_time_saved * 60, "Seconds", [
+                    {"Name": "Repository", "Value": request.repository}
+                ])
             
-            logger.info("Impact analysis completed", 
-                       analysis_id=analysis_id, 
-                       tests_selected=len(selected_tests),
-                       time_saved=estimated_time_saved)
+            log.info("Impact analysis completed", 
+                     tests_selected=len(selected_tests),
+                     time_saved=estimated_time_saved)
             
             return AnalysisResponse(
                 analysis_id=analysis_id,
                 pull_request_id=request.pull_request_id,
                 repository=request.repository,
-                selected_tests=selected_tests,
+                selected_tests=[test.to_schema() for test in selected_tests],
                 estimated_time_saved=estimated_time_saved,
                 risk_score=risk_score,
                 analysis_reasoning=analysis_reasoning,
                 total_tests_in_repo=total_tests,
                 tests_selected_count=len(selected_tests),
                 confidence_score=confidence_score,
-                created_at=analysis_result.created_at
+                created_at=created_at
             )
             
         except Exception as e:
-            logger.error("Impact analysis failed", 
-                        repository=request.repository, 
-                        pull_request_id=request.pull_request_id,
-                        error=str(e))
+            log.error("Impact analysis failed", error=str(e))
             raise
     
     async def _get_or_create_repository(self, db: AsyncSession, repo_name: str) -> Repository:
         """Get or create repository record"""
-        try:
-            # Parse owner/repo from repo_name
-            if '/' in repo_name:
-                owner, name = repo_name.split('/', 1)
-            else:
-                owner = "unknown"
-                name = repo_name
-            
-            # Check if repository exists
-            stmt = select(Repository).where(Repository.full_name == repo_name)
-            result = await db.execute(stmt)
-            repo = result.scalar_one_or_none()
-            
-            if not repo:
-                repo = Repository(
-                    name=name,
-                    owner=owner,
-                    full_name=repo_name,
-                    default_branch="main"
-                )
-                db.add(repo)
-                await db.commit()
-                await db.refresh(repo)
-            
-            return repo
-            
-        except Exception as e:
-            logger.error("Failed to get/create repository", repo_name=repo_name, error=str(e))
-            raise
+        # Parse owner/repo from repo_name
+        if '/' in repo_name:
+            owner, name = repo_name.split('/', 1)
+        else:
+            owner = "unknown"
+            name = repo_name
+        
+        # Check if repository exists
+        stmt = select(Repository).where(Repository.full_name == repo_name)
+        result = await db.execute(stmt)
+        repo = result.scalar_one_or_none()
+        
+        if not repo:
+            repo = Repository(
+                name=name,
+                owner=owner,
+                full_name=repo_name,
+                default_branch="main"
+            )
+            db.add(repo)
+            await db.commit()
+        
+        return repo
     
-    async def _find_related_tests(self, db: AsyncSession, changed_files: List) -> Tuple[List[TestInfo], int]:
+    async def _find_related_tests(self, db: AsyncSession, changed_files: List) -> Tuple[List[_TestInfoRaw], int]:
         """Find tests related to changed files"""
         try:
-            selected_tests = []
+            selected_tests: List[_TestInfoRaw] = []
             test_file_paths = set()
+            weights = self.risk_weights
+            
+            # Serve coverage mappings from the cache where possible
+            paths = list(dict.fromkeys(changed_file.file_path for changed_file in changed_files))
+            mappings_by_file: Dict[str, Tuple[MappingSnapshot, ...]] = {}
+            misses = []
+            for path in paths:
+                cached = self._mapping_cache.get(path)
+                if cached is None:
+                    misses.append(path)
+                else:
+                    mappings_by_file[path] = cached
+            
+            if misses:
+                # Fetch the remaining files in one query, overlapped with
+                # the independent total tests count
+                # History comes from _get_test_history, so only the mapping
+                # columns are selected
+                stmt = select(
+                    CoverageMapping.id,
+                    CoverageMapping.file_path,
+                    CoverageMapping.test_file_path,
+                    CoverageMapping.test_function_name,
+                    CoverageMapping.coverage_percentage
+                ).where(CoverageMapping.file_path.in_(misses))
+                
+                # Wait for both before raising so the query never outlives
+                # the request session; the original exception is re-raised
+                total_tests, result = await asyncio.gather(
+                    self._count_total_tests(),
+                    db.execute(stmt),
+                    return_exceptions=True
+                )
+                for outcome in (total_tests, result):
+                    if isinstance(outcome, BaseException):
+                        raise outcome
+                fetched: Dict[str, List[MappingSnapshot]] = defaultdict(list)
+                for row in result.all():
+                    fetched[row.file_path].append(MappingSnapshot(*row))
+                
+                # Files without mappings are cached too, as empty tuples
+                for path in misses:
+                    mappings = tuple(fetched.get(path, ()))
+                    self._mapping_cache[path] = mappings
+                    mappings_by_file[path] = mappings
+            else:
+                total_tests = await self._count_total_tests()
             
-            # Get total tests count
-            total_tests_stmt = select(func.count(CoverageMapping.test_file_path.distinct()))
-            total_tests_result = await db.execute(total_tests_stmt)
-            total_tests = total_tests_result.scalar()
+            mapping_ids = [mapping.id for mappings in mappings_by_file.values() for mapping in mappings]
+            if not mapping_ids:
+                # No coverage for any changed file: no history to fetch or tests to rank
+                return selected_tests, total_tests
+            
+            # Get test execution history for every mapping in one query
+            history_by_mapping = await self._get_test_history(db, mapping_ids)
             
             for changed_file in changed_files:
-                # Find coverage mappings for this file
-                stmt = select(CoverageMapping).where(
-                    CoverageMapping.file_path == changed_file.file_path
-                ).options(selectinload(CoverageMapping.test_history))
-                
-                result = await db.execute(stmt)
-                mappings = result.scalars().all()
-                
-                for mapping in mappings:
+                for mapping in mappings_by_file.get(changed_file.file_path, []):
                     if mapping.test_file_path not in test_file_paths:
-                        # Get test execution history for this test
-                        test_history = await self._get_test_history(db, mapping.id)
+                        test_history = history_by_mapping.get(mapping.id, [])
                         
                         # Calculate estimated execution time
                         estimated_time = self._estimate_execution_time(test_history)
@@ -179,29 +269,28 @@ class ImpactAnalyzer:
                             mapping, changed_file, test_history
                         )
                         
-                        test_info = TestInfo(
+                        test_info = _TestInfoRaw(
                             test_file_path=mapping.test_file_path,
                             test_function_name=mapping.test_function_name,
                             coverage_percentage=mapping.coverage_percentage,
                             estimated_execution_time=estimated_time,
                             priority=priority,
-                            reason=reason
+                            reason=reason,
+                            weight=weights.get(priority, 0.5)
                         )
                         
                         selected_tests.append(test_info)
                         test_file_paths.add(mapping.test_file_path)
             
-            # Sort tests by priority and coverage
-            selected_tests.sort(key=lambda x: (
-                self.risk_weights.get(x.priority, 0.5),
+            # Keep the top 50 tests by priority and coverage to avoid overwhelming CI
+            total_found = len(selected_tests)
+            selected_tests = heapq.nlargest(50, selected_tests, key=lambda x: (
+                x.weight,
                 x.coverage_percentage
-            ), reverse=True)
-            
-            # Limit to top 50 tests to avoid overwhelming CI
-            if len(selected_tests) > 50:
-                selected_tests = selected_tests[:50]
-                logger.info("Limited selected tests to top 50", 
-                           total_found=len(selected_tests))
+            ))
+            if total_found > 50:
+                logger.debug("Limited selected tests to top 50", 
+                            total_found=total_found)
             
             return selected_tests, total_tests
             
@@ -209,20 +298,62 @@ class ImpactAnalyzer:
             logger.error("Failed to find related tests", error=str(e))
             raise
     
-    async def _get_test_history(self, db: AsyncSession, coverage_mapping_id: int) -> List[TestHistory]:
-        """Get test execution history for a coverage mapping"""
+    async def _count_total_tests(self) -> int:
+        """Count distinct test files across all coverage mappings, cached for 60 seconds"""
+        total_tests, fetched_at = self._total_tests_cache
+        if time.monotonic() - fetched_at < 60:
+            return total_tests
+        
+        # One caller refreshes; concurrent misses wait and reuse its result
+        async with self._total_tests_lock:
+            total_tests, fetched_at = self._total_tests_cache
+            if time.monotonic() - fetched_at < 60:
+                return total_tests
+            
+            # Uses its own session so it can run alongside queries on the
+            # request session, which only serves one statement at a time
+            async with AsyncSessionLocal() as session:
+                stmt = select(func.count(CoverageMapping.test_file_path.distinct()))
+                result = await session.execute(stmt)
+                total_tests = result.scalar()
+            
+            self._total_tests_cache = (total_tests, time.monotonic())
+            return total_tests
+    
+    async def _get_test_history(self, db: AsyncSession, 
+                                coverage_mapping_ids: List[int]) -> Dict[int, List[TestHistory]]:
+        """Get the 10 most recent executions for each coverage mapping"""
+        if not coverage_mapping_ids:
+            return {}
+        
         try:
-            stmt = select(TestHistory).where(
-                TestHistory.coverage_mapping_id == coverage_mapping_id
-            ).order_by(TestHistory.execution_date.desc()).limit(10)
+            # Rank executions per mapping so only the latest 10 leave the database
+            ranked = select(
+                TestHistory,
+                func.row_number().over(
+                    partition_by=TestHistory.coverage_mapping_id,
+                    order_by=TestHistory.execution_date.desc()
+                ).label("rank")
+            ).where(
+                TestHistory.coverage_mapping_id.in_(coverage_mapping_ids)
+            ).subquery()
+            recent_history = aliased(TestHistory, ranked)
+            
+            stmt = select(recent_history).where(ranked.c.rank <= 10).order_by(
+                ranked.c.coverage_mapping_id, ranked.c.execution_date.desc()
+            )
             
             result = await db.execute(stmt)
-            return result.scalars().all()
+            history_by_mapping: Dict[int, List[TestHistory]] = defaultdict(list)
+            for test_history in result.scalars().all():
+                history_by_mapping[test_history.coverage_mapping_id].append(test_history)
+            
+            return history_by_mapping
             
         except Exception as e:
             logger.error("Failed to get test history", 
-                        coverage_mapping_id=coverage_mapping_id, error=str(e))
-            return []
+                        mappings=len(coverage_mapping_ids), error=str(e))
+            return {}
     
     def _estimate_execution_time(self, test_history: List[TestHistory]) -> float:
         """Estimate execution time based on historical data"""
@@ -252,7 +383,7 @@ class ImpactAnalyzer:
         else:
             return "low"
     
-    def _generate_selection_reason(self, mapping: CoverageMapping, changed_file, 
+    def _generate_selection_reason(self, mapping: MappingSnapshot, changed_file, 
                                   test_history: List[TestHistory]) -> str:
         """Generate human-readable reason for test selection"""
         reasons = []
@@ -275,96 +406,70 @@ class ImpactAnalyzer:
         
         return "; ".join(reasons)
     
-    async def _calculate_time_saved(self, db: AsyncSession, selected_tests: List[TestInfo], 
-                                   total_tests: int) -> float:
+    def _calculate_time_saved(self, selected_tests: List[_TestInfoRaw], 
+                              total_tests: int) -> float:
         """Calculate estimated time saved by running only selected tests"""
-        try:
-            if total_tests == 0:
-                return 0.0
-            
-            # Calculate time for selected tests
-            selected_time = sum(test.estimated_execution_time for test in selected_tests)
-            
-            # Estimate time for all tests (assuming average 5 seconds per test)
-            estimated_total_time = total_tests * 5.0
-            
-            # Time saved = total time - selected time
-            time_saved = estimated_total_time - selected_time
-            
-            # Convert to minutes
-            return max(0.0, time_saved / 60.0)
-            
-        except Exception as e:
-            logger.error("Failed to calculate time saved", error=str(e))
+        if total_tests == 0:
             return 0.0
+        
+        # Calculate time for selected tests
+        selected_time = sum(test.estimated_execution_time for test in selected_tests)
+        
+        # Estimate time for all tests (assuming average 5 seconds per test)
+        estimated_total_time = total_tests * 5.0
+        
+        # Time saved = total time - selected time
+        time_saved = estimated_total_time - selected_time
+        
+        # Convert to minutes
+        return max(0.0, time_saved / 60.0)
     
-    def _calculate_risk_score(self, selected_tests: List[TestInfo], 
-                             changed_files: List) -> float:
-        """Calculate risk score based on test selection and changes"""
-        try:
-            if not selected_tests:
-                return 1.0  # High risk if no tests selected
-            
-            # Calculate risk based on test priorities
-            priority_scores = []
-            for test in selected_tests:
-                priority_scores.append(self.risk_weights.get(test.priority, 0.5))
-            
-            avg_priority_score = sum(priority_scores) / len(priority_scores)
-            
-            # Adjust risk based on coverage
-            avg_coverage = sum(test.coverage_percentage for test in selected_tests) / len(selected_tests)
-            coverage_factor = 1.0 - (avg_coverage / 100.0)
-            
-            # Final risk score (0.0 = low risk, 1.0 = high risk)
-            risk_score = (avg_priority_score + coverage_factor) / 2.0
-            
-            return min(1.0, max(0.0, risk_score))
-            
-        except Exception as e:
-            logger.error("Failed to calculate risk score", error=str(e))
-            return 0.5
-    
-    def _calculate_confidence_score(self, selected_tests: List[TestInfo], 
-                                   changed_files: List) -> float:
-        """Calculate confidence in the analysis"""
-        try:
-            if not selected_tests:
-                return 0.0
-            
-            # Confidence factors
-            coverage_confidence = sum(test.coverage_percentage for test in selected_tests) / len(selected_tests) / 100.0
-            
-            # More tests = higher confidence (up to a point)
-            test_count_confidence = min(len(selected_tests) / 20.0, 1.0)
-            
-            # File change confidence
-            file_change_confidence = 1.0 if len(changed_files) <= 10 else 0.8
-            
-            # Weighted average
-            confidence = (coverage_confidence * 0.5 + 
-                         test_count_confidence * 0.3 + 
-                         file_change_confidence * 0.2)
-            
-            return min(1.0, max(0.0, confidence))
-            
-        except Exception as e:
-            logger.error("Failed to calculate confidence score", error=str(e))
-            return 0.5
+    def _score_all(self, selected_tests: List[_TestInfoRaw], 
+                   changed_files_count: int) -> Tuple[float, float, int]:
+        """Calculate risk score, confidence score and high-priority count in one pass"""
+        if not selected_tests:
+            return 1.0, 0.0, 0  # High risk, no confidence if no tests selected
+        
+        sum_priority = 0.0
+        sum_coverage = 0.0
+        high_priority = 0
+        for test in selected_tests:
+            priority = test.priority
+            sum_priority += test.weight
+            sum_coverage += test.coverage_percentage
+            if priority == "high":
+                high_priority += 1
+        
+        n = len(selected_tests)
+        avg_priority_score = sum_priority / n
+        avg_coverage = sum_coverage / n / 100.0
+        
+        # Risk based on test priorities, adjusted by coverage
+        # (0.0 = low risk, 1.0 = high risk)
+        risk_score = (avg_priority_score + (1.0 - avg_coverage)) / 2.0
+        
+        # Confidence: coverage, test count (up to a point) and change size
+        test_count_confidence = min(n / 20.0, 1.0)
+        file_change_confidence = 1.0 if changed_files_count <= 10 else 0.8
+        confidence = (avg_coverage * 0.5 + 
+                     test_count_confidence * 0.3 + 
+                     file_change_confidence * 0.2)
+        
+        return (min(1.0, max(0.0, risk_score)),
+                min(1.0, max(0.0, confidence)),
+                high_priority)
     
-    def _generate_analysis_reasoning(self, selected_tests: List[TestInfo], 
-                                   changed_files: List, risk_score: float, 
+    def _generate_analysis_reasoning(self, selected_count: int, changed_files_count: int, 
+                                   high_priority: int, risk_score: float, 
                                    confidence_score: float) -> str:
         """Generate human-readable analysis reasoning"""
         reasoning_parts = []
         
-        reasoning_parts.append(f"Analysis of {len(changed_files)} changed files")
-        reasoning_parts.append(f"Selected {len(selected_tests)} relevant tests")
+        reasoning_parts.append(f"Analysis of {changed_files_count} changed files")
+        reasoning_parts.append(f"Selected {selected_count} relevant tests")
         
-        if selected_tests:
-            high_priority = sum(1 for test in selected_tests if test.priority == "high")
-            if high_priority > 0:
-                reasoning_parts.append(f"{high_priority} high-priority tests selected")
+        if high_priority > 0:
+            reasoning_parts.append(f"{high_priority} high-priority tests selected")
         
         reasoning_parts.append(f"Risk score: {risk_score:.2f} (0.0 = low, 1.0 = high)")
         reasoning_parts.append(f"Confidence: {confidence_score:.2f} (0.0 = low, 1.0 = high)")
@@ -0,0 +1,103 @@
+import asyncio
+import math
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+import structlog
+
+from .aws_service import aws_service, METRIC_BATCH_SIZE
+
+logger = structlog.get_logger()
+
+
+def _new_stats() -> List[float]:
+    # count, sum, min, max
+    return [0, 0.0, math.inf, 0.0]
+
+
+class RequestMetricsAggregator:
+    """Aggregates per-endpoint request metrics in process and flushes them
+    to CloudWatch as statistic sets on a fixed interval"""
+
+    def __init__(self, flush_interval: float = 30.0):
+        self.flush_interval = flush_interval
+        self._stats: Dict[Tuple[str, str], List[float]] = defaultdict(_new_stats)
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, path: str, method: str, duration: float):
+        """Record one request; runs on the event loop thread so no locking is needed"""
+        stats = self._stats[(path, method)]
+        stats[0] += 1
+        stats[1] += duration
+        if duration < stats[2]:
+            stats[2] = duration
+        if duration > stats[3]:
+            stats[3] = duration
+
+    def start(self):
+        """Start the periodic flush task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the periodic flush task and flush what is left"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Send the current window as statistic sets and start a new one"""
+        snapshot, self._stats = self._stats, defaultdict(_new_stats)
+        if not snapshot:
+            return
+
+        timestamp = datetime.now(timezone.utc)
+        metric_data: List[Dict[str, Any]] = []
+        for (path, method), (count, total, minimum, maximum) in snapshot.items():
+            dimensions = [
+                {"Name": "Endpoint", "Value": path},
+                {"Name": "Method", "Value": method}
+            ]
+            metric_data.append({
+                'MetricName': 'RequestDuration',
+                'Dimensions': dimensions,
+                'Timestamp': timestamp,
+                'Unit': 'Seconds',
+                'StatisticValues': {
+                    'SampleCount': count,
+                    'Sum': total,
+                    'Minimum': minimum,
+                    'Maximum': maximum
+                }
+            })
+            metric_data.append({
+                'MetricName': 'RequestCount',
+                'Dimensions': dimensions,
+                'Timestamp': timestamp,
+                'Unit': 'Count',
+                'Value': count
+            })
+
+        try:
+            for start in range(0, len(metric_data), METRIC_BATCH_SIZE):
+                await asyncio.to_thread(
+                    aws_service.put_metric_data,
+                    metric_data[start:start + METRIC_BATCH_SIZE]
+                )
+        except Exception as e:
+            logger.error("Failed to flush request metrics", error=str(e))
+
+
+# Global request metrics aggregator
+request_metrics = RequestMetricsAggregator()
\ No newline at end of file
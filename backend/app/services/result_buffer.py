@@ -0,0 +1,111 @@
+import asyncio
+from typing import Dict, Any, Optional, List
+from sqlalchemy import insert
+import structlog
+
+from ..database import AsyncSessionLocal
+from ..models import AnalyzerResult
+
+logger = structlog.get_logger()
+
+# Rows written per INSERT; a batch also closes after RESULT_BATCH_INTERVAL seconds
+RESULT_BATCH_SIZE = 100
+RESULT_BATCH_INTERVAL = 0.1
+
+
+class AnalyzerResultBuffer:
+    """Background writer that batches AnalyzerResult rows into multi-row inserts.
+
+    Analyses enqueue their row and return; a task started in the application
+    lifespan drains the queue and writes each batch in one transaction.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background writer task"""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Write pending rows and stop the background task"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def add(self, row: Dict[str, Any]):
+        """Queue a row for insertion, writing it directly if the writer is not running"""
+        if self._queue is None:
+            await self._write([row])
+            return
+        # Waits when the queue is full rather than dropping results
+        await self._queue.put(row)
+
+    async def run(self):
+        """Collect batches from the queue and write them until stopped"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            row = await self._queue.get()
+            if row is None:
+                break
+
+            batch: List[Dict[str, Any]] = [row]
+            deadline = loop.time() + RESULT_BATCH_INTERVAL
+
+            while len(batch) < RESULT_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+
+            await self._write(batch)
+
+        # Write anything still queued behind the stop sentinel
+        batch = []
+        while not self._queue.empty():
+            row = self._queue.get_nowait()
+            if row is not None:
+                batch.append(row)
+        for start in range(0, len(batch), RESULT_BATCH_SIZE):
+            await self._write(batch[start:start + RESULT_BATCH_SIZE])
+
+    async def _write(self, rows: List[Dict[str, Any]]):
+        try:
+            await self._insert(rows)
+        except Exception as e:
+            if len(rows) == 1:
+                logger.error("Failed to write analyzer result",
+                             analysis_id=rows[0].get("analysis_id"), error=str(e))
+                return
+            # The batch is one transaction; retry row by row so a single bad
+            # row does not lose results whose IDs were already returned
+            logger.warning("Analyzer result batch failed, retrying rows individually",
+                           rows=len(rows), error=str(e))
+            for row in rows:
+                await self._write([row])
+
+    async def _insert(self, rows: List[Dict[str, Any]]):
+        async with AsyncSessionLocal() as session:
+            await session.execute(insert(AnalyzerResult), rows)
+            await session.commit()
+
+
+# Global analyzer result buffer
+analyzer_results = AnalyzerResultBuffer()
\ No newline at end of file
@@ -0,0 +1,59 @@
+import asyncio
+
+import boto3
+import pytest
+
+from app.schemas import AnalysisRequest, ChangedFile
+from app.services.cloudwatch_sink import cloudwatch_sink
+from app.services.impact_analyzer import ImpactAnalyzer, _TestInfoRaw
+from app.services.result_buffer import analyzer_results
+
+
+def _selected_test() -> _TestInfoRaw:
+    return _TestInfoRaw(
+        test_file_path="tests/test_app.py",
+        test_function_name="test_app",
+        coverage_percentage=80.0,
+        estimated_execution_time=5.0,
+        priority="high",
+        reason="Covers app.py",
+        weight=1.0
+    )
+
+
+@pytest.mark.asyncio
+async def test_analysis_metrics_use_valid_cloudwatch_units(monkeypatch):
+    analyzer = ImpactAnalyzer()
+
+    async def get_or_create_repository(db, repo_name):
+        return None
+
+    async def find_related_tests(db, changed_files):
+        return [_selected_test()], 100
+
+    async def add(row):
+        pass
+
+    monkeypatch.setattr(analyzer, "_get_or_create_repository", get_or_create_repository)
+    monkeypatch.setattr(analyzer, "_find_related_tests", find_related_tests)
+    monkeypatch.setattr(analyzer_results, "add", add)
+    # Collect what would be shipped without starting the sink's drain task
+    queue = asyncio.Queue()
+    monkeypatch.setattr(cloudwatch_sink, "_queue", queue)
+
+    request = AnalysisRequest(
+        repository="owner/repo",
+        pull_request_id="1",
+        changed_files=[ChangedFile(file_path="app.py", change_type="modified")],
+        head_branch="feature"
+    )
+    await analyzer.analyze_impact(None, request)
+
+    standard_units = set(
+        boto3.client("cloudwatch", region_name="us-east-1")
+        .meta.service_model.shape_for("StandardUnit").enum
+    )
+    items = [queue.get_nowait() for _ in range(queue.qsize())]
+    units = [item[1]["Unit"] for item in items if item[0] == "metric"]
+    assert units
+    assert set(units) <= standard_units
@@ -0,0 +1,49 @@
+import zstandard
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.middleware import ZstdMiddleware
+
+BODY = "impact " * 1000
+
+
+def _client(vary: str = None) -> TestClient:
+    async def endpoint(request):
+        headers = {"Vary": vary} if vary else None
+        return PlainTextResponse(BODY, headers=headers)
+
+    app = Starlette(
+        routes=[Route("/", endpoint)],
+        middleware=[Middleware(ZstdMiddleware), Middleware(GZipMiddleware)]
+    )
+    return TestClient(app)
+
+
+def test_zstd_response_is_compressed_and_varies_once():
+    response = _client().get("/", headers={"Accept-Encoding": "zstd, gzip"})
+
+    assert response.headers["content-encoding"] == "zstd"
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(response.content).decode() == BODY
+    tokens = [token.strip().lower() for token in response.headers["vary"].split(",")]
+    assert tokens.count("accept-encoding") == 1
+
+
+def test_zstd_does_not_duplicate_existing_vary_token():
+    response = _client(vary="Accept, accept-encoding").get(
+        "/", headers={"Accept-Encoding": "zstd"}
+    )
+
+    assert response.headers["content-encoding"] == "zstd"
+    tokens = [token.strip().lower() for token in response.headers["vary"].split(",")]
+    assert tokens == ["accept", "accept-encoding"]
+
+
+def test_gzip_only_clients_fall_through():
+    response = _client().get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == BODY
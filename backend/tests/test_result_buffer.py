@@ -0,0 +1,41 @@
+import pytest
+
+from app.services.result_buffer import AnalyzerResultBuffer
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_row_by_row(monkeypatch):
+    buffer = AnalyzerResultBuffer()
+    written = []
+
+    async def insert(rows):
+        if any(row["analysis_id"] == "bad" for row in rows):
+            raise ValueError("invalid row")
+        written.extend(rows)
+
+    monkeypatch.setattr(buffer, "_insert", insert)
+
+    rows = [{"analysis_id": "a"}, {"analysis_id": "bad"}, {"analysis_id": "b"}]
+    await buffer._write(rows)
+
+    assert [row["analysis_id"] for row in written] == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_queued_rows_survive_a_failed_batch(monkeypatch):
+    buffer = AnalyzerResultBuffer()
+    written = []
+
+    async def insert(rows):
+        if any(row["analysis_id"] == "bad" for row in rows):
+            raise ValueError("invalid row")
+        written.extend(rows)
+
+    monkeypatch.setattr(buffer, "_insert", insert)
+
+    buffer.start()
+    for analysis_id in ("a", "bad", "b"):
+        await buffer.add({"analysis_id": analysis_id})
+    await buffer.stop()
+
+    assert sorted(row["analysis_id"] for row in written) == ["a", "b"]
@@ -7,22 +7,29 @@ import aws_cdk as cdk
 from aws_cdk import (
     Stack,
     aws_ecs as ecs,
+    aws_ecr_assets as ecr_assets,
     aws_ecs_patterns as ecs_patterns,
+    aws_elasticloadbalancingv2 as elbv2,
     aws_rds as rds,
     aws_s3 as s3,
     aws_apigateway as apigateway,
+    aws_applicationautoscaling as appscaling,
     aws_ec2 as ec2,
     aws_logs as logs,
     aws_iam as iam,
+    aws_kinesisfirehose as firehose,
     aws_secretsmanager as secretsmanager,
     Duration,
     RemovalPolicy,
     CfnOutput,
 )
 from constructs import Construct
+from deploy_time_build import SociIndexBuild
 
 
-class ImpactAnalyzerStack(Stack):
+class NetworkStack(Stack):
+    """VPC and the ECS service security group"""
+
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
@@ -50,18 +57,67 @@ class ImpactAnalyzerStack(Stack):
             ]
         )
 
-        # Security Group for RDS
+        # Security Group for ECS service
+        service_security_group = self._create_service_security_group(vpc)
+
+        # Shared with the data and service stacks
+        self.vpc = vpc
+        self.service_security_group = service_security_group
+
+    def _create_service_security_group(self, vpc: ec2.Vpc) -> ec2.SecurityGroup:
+        """Create security group for ECS service"""
+        security_group = ec2.SecurityGroup(
+            self, "ECSServiceSecurityGroup",
+            vpc=vpc,
+            description="Security group for ECS service",
+            allow_all_outbound=True
+        )
+
+        # Traffic arrives from API Gateway's VPC Link via a load balancer inside the VPC
+        security_group.add_ingress_rule(
+            peer=ec2.Peer.ipv4(vpc.vpc_cidr_block),
+            connection=ec2.Port.tcp(8000),
+            description="Allow HTTP access to backend service from within the VPC"
+        )
+
+        return security_group
+
+
+class DataStack(Stack):
+    """RDS PostgreSQL behind RDS Proxy, the reports bucket, and logging"""
+
+    def __init__(self, scope: Construct, construct_id: str, network: NetworkStack, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        vpc = network.vpc
+
+        # Security Group for RDS; the proxy's ingress on it is added by
+        # add_proxy below, so both groups live in this stack
         rds_security_group = ec2.SecurityGroup(
             self, "RDSSecurityGroup",
             vpc=vpc,
             description="Security group for RDS instance",
             allow_all_outbound=False
         )
-        rds_security_group.add_ingress_rule(
-            peer=ec2.Peer.any_ipv4(),
+
+        # Security Group for RDS Proxy: only the ECS service connects to it
+        proxy_security_group = ec2.SecurityGroup(
+            self, "RDSProxySecurityGroup",
+            vpc=vpc,
+            description="Security group for RDS Proxy",
+            allow_all_outbound=False
+        )
+        proxy_security_group.add_ingress_rule(
+            peer=network.service_security_group,
             connection=ec2.Port.tcp(5432),
             description="Allow PostgreSQL access from ECS tasks"
         )
+        # Secrets Manager lookups for the database credentials
+        proxy_security_group.add_egress_rule(
+            peer=ec2.Peer.any_ipv4(),
+            connection=ec2.Port.tcp(443),
+            description="Allow HTTPS to AWS APIs"
+        )
 
         # RDS PostgreSQL Instance
         db_credentials = rds.Credentials.from_generated_secret(
@@ -75,9 +131,14 @@ class ImpactAnalyzerStack(Stack):
                 version=rds.PostgresEngineVersion.VER_15_4
             ),
             instance_type=ec2.InstanceType.of(
-                ec2.InstanceClass.T3,
-                ec2.InstanceSize.MICRO
+                ec2.InstanceClass.T4G,
+                ec2.InstanceSize.SMALL
             ),
+            # gp3 gives a 3000 IOPS / 125 MiB/s baseline regardless of size;
+            # storage grows automatically up to the max
+            storage_type=rds.StorageType.GP3,
+            allocated_storage=50,
+            max_allocated_storage=200,
             credentials=db_credentials,
             database_name="impact_analyzer",
             vpc=vpc,
@@ -85,6 +146,8 @@ class ImpactAnalyzerStack(Stack):
                 subnet_type=ec2.SubnetType.PRIVATE_ISOLATED
             ),
             security_groups=[rds_security_group],
+            # Standby in the second AZ; the VPC's two AZs are shared with ECS
+            multi_az=True,
             backup_retention=Duration.days(7),
             deletion_protection=False,
             removal_policy=RemovalPolicy.DESTROY,
@@ -93,6 +156,20 @@ class ImpactAnalyzerStack(Stack):
             enable_performance_insights=True
         )
 
+        # RDS Proxy pools connections across tasks so scale-out does not
+        # exhaust the instance's max_connections
+        proxy = database.add_proxy(
+            "ImpactAnalyzerRdsProxy",
+            secrets=[database.secret],
+            vpc=vpc,
+            vpc_subnets=ec2.SubnetSelection(
+                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+            ),
+            security_groups=[proxy_security_group],
+            require_tls=True,
+            idle_client_timeout=Duration.minutes(30)
+        )
+
         # S3 Bucket for reports and artifacts
         s3_bucket = s3.Bucket(
             self, "ImpactAnalyzerBucket",
@@ -107,16 +184,22 @@ class ImpactAnalyzerStack(Stack):
                     id="cleanup-old-artifacts",
                     enabled=True,
                     expiration=Duration.days(90),
+                    # Access patterns vary per report; let S3 tier each object
                     transitions=[
                         s3.Transition(
-                            storage_class=s3.StorageClass.INFREQUENT_ACCESS,
-                            transition_after=Duration.days(30)
-                        ),
-                        s3.Transition(
-                            storage_class=s3.StorageClass.GLACIER,
-                            transition_after=Duration.days(60)
+                            storage_class=s3.StorageClass.INTELLIGENT_TIERING,
+                            transition_after=Duration.days(0)
                         )
-                    ]
+                    ],
+                    # Overwritten reports only need a short recovery window
+                    noncurrent_version_expiration=Duration.days(30),
+                    noncurrent_version_transitions=[
+                        s3.NoncurrentVersionTransition(
+                            storage_class=s3.StorageClass.GLACIER_INSTANT_RETRIEVAL,
+                            transition_after=Duration.days(7)
+                        )
+                    ],
+                    abort_incomplete_multipart_upload_after=Duration.days(1)
                 )
             ]
         )
@@ -125,44 +208,194 @@ class ImpactAnalyzerStack(Stack):
         log_group = logs.LogGroup(
             self, "ImpactAnalyzerLogGroup",
             log_group_name="/aws/ecs/impact-analyzer",
-            retention=logs.RetentionDays.ONE_MONTH,
+            retention=logs.RetentionDays.ONE_WEEK,
             removal_policy=RemovalPolicy.DESTROY
         )
 
+        # Stream the backend writes to directly (CLOUDWATCH_LOG_STREAM); created
+        # here so the application never needs CreateLogStream at runtime
+        logs.LogStream(
+            self, "ImpactAnalyzerBackendLogStream",
+            log_group=log_group,
+            log_stream_name="backend",
+            removal_policy=RemovalPolicy.DESTROY
+        )
+
+        # Archive logs to S3 through Firehose; the bucket lifecycle rules then
+        # manage them, so CloudWatch only keeps the last week
+        firehose_role = iam.Role(
+            self, "LogArchiveFirehoseRole",
+            assumed_by=iam.ServicePrincipal("firehose.amazonaws.com")
+        )
+        s3_bucket.grant_read_write(firehose_role)
+
+        log_archive_stream = firehose.CfnDeliveryStream(
+            self, "LogArchiveDeliveryStream",
+            delivery_stream_type="DirectPut",
+            extended_s3_destination_configuration=firehose.CfnDeliveryStream.ExtendedS3DestinationConfigurationProperty(
+                bucket_arn=s3_bucket.bucket_arn,
+                role_arn=firehose_role.role_arn,
+                prefix="archive/logs/",
+                error_output_prefix="archive/logs-errors/",
+                buffering_hints=firehose.CfnDeliveryStream.BufferingHintsProperty(
+                    interval_in_seconds=300,
+                    size_in_m_bs=5
+                ),
+                # Subscription payloads arrive gzipped already
+                compression_format="UNCOMPRESSED"
+            )
+        )
+        log_archive_stream.node.add_dependency(firehose_role)
+
+        log_subscription_role = iam.Role(
+            self, "LogArchiveSubscriptionRole",
+            assumed_by=iam.ServicePrincipal("logs.amazonaws.com")
+        )
+        log_subscription_role.add_to_policy(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["firehose:PutRecord", "firehose:PutRecordBatch"],
+                resources=[log_archive_stream.attr_arn]
+            )
+        )
+
+        log_subscription = logs.CfnSubscriptionFilter(
+            self, "LogArchiveSubscription",
+            log_group_name=log_group.log_group_name,
+            filter_pattern="",
+            destination_arn=log_archive_stream.attr_arn,
+            role_arn=log_subscription_role.role_arn
+        )
+        log_subscription.node.add_dependency(log_subscription_role)
+
+        # Shared with the service stack
+        self.database = database
+        self.proxy = proxy
+        self.s3_bucket = s3_bucket
+        self.log_group = log_group
+
+        # Outputs
+        CfnOutput(
+            self, "DatabaseEndpoint",
+            value=database.instance_endpoint.hostname,
+            description="RDS PostgreSQL endpoint"
+        )
+
+        CfnOutput(
+            self, "DatabaseProxyEndpoint",
+            value=proxy.endpoint,
+            description="RDS Proxy endpoint used by the ECS service"
+        )
+
+        CfnOutput(
+            self, "S3BucketName",
+            value=s3_bucket.bucket_name,
+            description="S3 bucket for reports and artifacts"
+        )
+
+
+class ServiceStack(Stack):
+    """ECS Fargate service, its internal NLB, and the API Gateway front door"""
+
+    def __init__(self, scope: Construct, construct_id: str, network: NetworkStack,
+                 data: DataStack, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        vpc = network.vpc
+        database = data.database
+        proxy = data.proxy
+        s3_bucket = data.s3_bucket
+        log_group = data.log_group
+
+        # Browser origins allowed by the backend's CORS policy, e.g.
+        # cdk deploy -c allowed_origins=https://dashboard.example.com
+        # (comma-separated) and/or -c allowed_origin_regex=<pattern>
+        cors_environment = {}
+        allowed_origins = self.node.try_get_context("allowed_origins")
+        allowed_origin_regex = self.node.try_get_context("allowed_origin_regex")
+        if allowed_origins:
+            cors_environment["ALLOWED_ORIGINS"] = allowed_origins
+        if allowed_origin_regex:
+            cors_environment["ALLOWED_ORIGIN_REGEX"] = allowed_origin_regex
+        if not cors_environment:
+            # The backend's default only admits localhost, which would reject the dashboard
+            raise ValueError(
+                "Set the dashboard origin with -c allowed_origins=<origins> "
+                "or -c allowed_origin_regex=<pattern>"
+            )
+
         # ECS Cluster
         cluster = ecs.Cluster(
             self, "ImpactAnalyzerCluster",
             vpc=vpc,
             container_insights=True,
-            default_cloud_map_namespace_name="impact-analyzer.local"
+            enable_fargate_capacity_providers=True
         )
 
         # Task Definition
         task_definition = ecs.FargateTaskDefinition(
             self, "ImpactAnalyzerTask",
-            memory_limit_mib=1024,
-            cpu=512,
+            memory_limit_mib=2048,
+            cpu=1024,
+            # Graviton: cheaper per vCPU than x86 Fargate
+            runtime_platform=ecs.RuntimePlatform(
+                cpu_architecture=ecs.CpuArchitecture.ARM64,
+                operating_system_family=ecs.OperatingSystemFamily.LINUX
+            ),
             execution_role=self._create_execution_role(s3_bucket, log_group),
-            task_role=self._create_task_role(s3_bucket, database)
+            task_role=self._create_task_role(s3_bucket, database, log_group)
+        )
+
+        # Backend image, with a SOCI index so Fargate lazy-loads it instead
+        # of pulling the whole image before the task starts
+        # Reuse layers from a registry build cache when one is configured
+        # (cdk deploy -c docker_cache_repo=<ecr repository uri>)
+        cache_options = {}
+        docker_cache_repo = self.node.try_get_context("docker_cache_repo")
+        if docker_cache_repo:
+            cache_options = {
+                "cache_from": [ecr_assets.DockerCacheOption(
+                    type="registry",
+                    params={"ref": f"{docker_cache_repo}:buildcache"}
+                )],
+                "cache_to": ecr_assets.DockerCacheOption(
+                    type="registry",
+                    params={"ref": f"{docker_cache_repo}:buildcache", "mode": "max"}
+                )
+            }
+
+        image_asset = ecr_assets.DockerImageAsset(
+            self, "ImpactAnalyzerImage",
+            directory="../backend",
+            platform=ecr_assets.Platform.LINUX_ARM64,
+            build_args={"BUILDKIT_INLINE_CACHE": "1"},
+            **cache_options
         )
+        SociIndexBuild.from_docker_image_asset(self, "ImpactAnalyzerImageSociIndex", image_asset)
 
         # Container Definition
         container = task_definition.add_container(
             "ImpactAnalyzerContainer",
-            image=ecs.ContainerImage.from_asset("../backend"),
+            image=ecs.ContainerImage.from_docker_image_asset(image_asset),
+            # Non-blocking: under CloudWatch backpressure the driver buffers and
+            # then drops lines instead of blocking the app's stdout writes
             logging=ecs.LogDrivers.aws_logs(
                 log_group=log_group,
-                stream_prefix="backend"
+                stream_prefix="backend",
+                mode=ecs.AwsLogDriverMode.NON_BLOCKING,
+                max_buffer_size=cdk.Size.mebibytes(25)
             ),
             environment={
-                "DATABASE_URL": database.instance_endpoint.hostname,
-                "RDS_HOST": database.instance_endpoint.hostname,
+                "RDS_HOST": proxy.endpoint,
                 "RDS_PORT": "5432",
                 "RDS_DATABASE": "impact_analyzer",
+                # Named prepared statements pin proxy connections to one client
+                "DB_STATEMENT_CACHE_SIZE": "0",
                 "S3_BUCKET_NAME": s3_bucket.bucket_name,
                 "AWS_REGION": self.region,
                 "CLOUDWATCH_LOG_GROUP": log_group.log_group_name,
-                "CLOUDWATCH_LOG_STREAM": "backend"
+                "CLOUDWATCH_LOG_STREAM": "backend",
+                **cors_environment
             },
             secrets={
                 "RDS_USERNAME": ecs.Secret.from_secrets_manager(
@@ -173,14 +406,8 @@ class ImpactAnalyzerStack(Stack):
                     database.secret,
                     field="password"
                 )
-            },
-            health_check=ecs.HealthCheck(
-                command=["CMD-SHELL", "curl -f http://localhost:8000/ping || exit 1"],
-                interval=Duration.seconds(30),
-                timeout=Duration.seconds(5),
-                retries=3,
-                start_period=Duration.seconds(60)
-            )
+            }
+            # Task health comes from the NLB target group check on /ping
         )
 
         container.add_port_mappings(
@@ -193,13 +420,48 @@ class ImpactAnalyzerStack(Stack):
             cluster=cluster,
             task_definition=task_definition,
             desired_count=2,
+            # Baseline tasks on on-demand Fargate, burst capacity mostly on Spot
+            capacity_provider_strategies=[
+                ecs.CapacityProviderStrategy(capacity_provider="FARGATE", base=2, weight=1),
+                ecs.CapacityProviderStrategy(capacity_provider="FARGATE_SPOT", weight=4)
+            ],
+            propagate_tags=ecs.PropagatedTagSource.SERVICE,
             min_healthy_percent=50,
             max_healthy_percent=200,
             vpc_subnets=ec2.SubnetSelection(
                 subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
             ),
-            security_groups=[self._create_service_security_group(vpc)],
-            service_name="impact-analyzer-backend"
+            security_groups=[network.service_security_group],
+            service_name="impact-analyzer-backend",
+            # Ignore target group health while a new task boots
+            health_check_grace_period=Duration.seconds(60)
+        )
+
+        # Internal NLB shared by every API route; API Gateway reaches it through the VPC Link
+        nlb = elbv2.NetworkLoadBalancer(
+            self, "ImpactAnalyzerNLB",
+            vpc=vpc,
+            internet_facing=False,
+            vpc_subnets=ec2.SubnetSelection(
+                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+            )
+        )
+        listener = nlb.add_listener("HttpListener", port=80)
+        listener.add_targets(
+            "ServiceTargets",
+            port=8000,
+            targets=[service.load_balancer_target(
+                container_name="ImpactAnalyzerContainer",
+                container_port=8000
+            )],
+            health_check=elbv2.HealthCheck(
+                protocol=elbv2.Protocol.HTTP,
+                path="/ping",
+                interval=Duration.seconds(10),
+                healthy_threshold_count=2,
+                unhealthy_threshold_count=2
+            ),
+            deregistration_delay=Duration.seconds(30)
         )
 
         # Auto Scaling
@@ -210,16 +472,16 @@ class ImpactAnalyzerStack(Stack):
 
         scaling.scale_on_cpu_utilization(
             "CpuScaling",
-            target_utilization_percent=70,
-            scale_in_cooldown=Duration.seconds(60),
-            scale_out_cooldown=Duration.seconds(60)
+            target_utilization_percent=60,
+            scale_in_cooldown=Duration.seconds(120),
+            scale_out_cooldown=Duration.seconds(30)
         )
 
         scaling.scale_on_memory_utilization(
             "MemoryScaling",
             target_utilization_percent=80,
-            scale_in_cooldown=Duration.seconds(60),
-            scale_out_cooldown=Duration.seconds(60)
+            scale_in_cooldown=Duration.seconds(120),
+            scale_out_cooldown=Duration.seconds(30)
         )
 
         # API Gateway
@@ -227,6 +489,8 @@ class ImpactAnalyzerStack(Stack):
             self, "ImpactAnalyzerAPI",
             rest_api_name="Impact Analyzer API",
             description="API Gateway for AI Driven Impact Analyzer",
+            # Callers are CI runners in-region; skip the edge-optimized CloudFront hop
+            endpoint_types=[apigateway.EndpointType.REGIONAL],
             default_cors_preflight_options=apigateway.CorsOptions(
                 allow_origins=apigateway.Cors.ALL_ORIGINS,
                 allow_methods=apigateway.Cors.ALL_METHODS,
@@ -234,54 +498,71 @@ class ImpactAnalyzerStack(Stack):
             ),
             deploy_options=apigateway.StageOptions(
                 stage_name="prod",
-                logging_level=apigateway.MethodLoggingLevel.INFO,
-                data_trace_enabled=True,
-                metrics_enabled=True
+                # Execution logs for errors only; no request/response bodies
+                logging_level=apigateway.MethodLoggingLevel.ERROR,
+                data_trace_enabled=False,
+                metrics_enabled=True,
+                # Cache only the health check; POST endpoints are never cached
+                cache_cluster_enabled=True,
+                cache_cluster_size="0.5",
+                # Shed load at the edge before it reaches Fargate and RDS
+                throttling_rate_limit=200,
+                throttling_burst_limit=400,
+                method_options={
+                    # The stage cache ignores the backend's Cache-Control and
+                    # stores error responses too, so the TTL bounds how long a
+                    # failed probe (which the backend marks no-store) is served
+                    "/api/v1/health/GET": apigateway.MethodDeploymentOptions(
+                        caching_enabled=True,
+                        cache_ttl=Duration.seconds(10)
+                    ),
+                    # Analysis is the expensive call
+                    "/api/v1/analyze/POST": apigateway.MethodDeploymentOptions(
+                        throttling_rate_limit=20,
+                        throttling_burst_limit=40
+                    )
+                }
             )
         )
 
-        # API Gateway Integration
-        integration = apigateway.Integration(
-            type=apigateway.IntegrationType.HTTP_PROXY,
-            integration_http_method="POST",
-            options=apigateway.IntegrationOptions(
-                connection_type=apigateway.ConnectionType.VPC_LINK,
-                vpc_link=apigateway.VpcLink(
-                    self, "VPCLink",
-                    vpc=vpc,
-                    targets=[service]
-                )
-            )
+        # One VPC Link to the shared NLB for every route
+        vpc_link = apigateway.VpcLink(
+            self, "VPCLink",
+            targets=[nlb]
         )
 
         # API Resources and Methods
         api_resource = api.root.add_resource("api").add_resource("v1")
         
         # Analyze endpoint
-        analyze_resource = api_resource.add_resource("analyze")
-        analyze_resource.add_method(
-            "POST",
-            integration=integration,
-            authorization_type=apigateway.AuthorizationType.NONE,
+        self._add_proxy_method(
+            api_resource.add_resource("analyze"), "POST", nlb, vpc_link,
             request_parameters={
                 "method.request.header.Content-Type": True
             }
         )
 
         # Health check endpoint
-        health_resource = api_resource.add_resource("health")
-        health_resource.add_method(
-            "GET",
-            integration=integration,
-            authorization_type=apigateway.AuthorizationType.NONE
-        )
+        self._add_proxy_method(api_resource.add_resource("health"), "GET", nlb, vpc_link)
 
         # Other endpoints
-        execute_tests_resource = api_resource.add_resource("execute-tests")
-        execute_tests_resource.add_method(
-            "POST",
-            integration=integration,
-            authorization_type=apigateway.AuthorizationType.NONE
+        self._add_proxy_method(api_resource.add_resource("execute-tests"), "POST", nlb, vpc_link)
+
+        # Scale out on request volume, which leads CPU during bursts; scale-in
+        # is left to the CPU and memory policies
+        scaling.scale_on_metric(
+            "RequestScaling",
+            metric=api.metric_count(
+                period=Duration.minutes(1),
+                statistic="Sum"
+            ),
+            scaling_steps=[
+                appscaling.ScalingInterval(upper=3000, change=0),
+                appscaling.ScalingInterval(lower=3000, change=+2),
+                appscaling.ScalingInterval(lower=6000, change=+4)
+            ],
+            adjustment_type=appscaling.AdjustmentType.CHANGE_IN_CAPACITY,
+            cooldown=Duration.seconds(30)
         )
 
         # Outputs
@@ -292,21 +573,30 @@ class ImpactAnalyzerStack(Stack):
         )
 
         CfnOutput(
-            self, "DatabaseEndpoint",
-            value=database.instance_endpoint.hostname,
-            description="RDS PostgreSQL endpoint"
+            self, "ECSClusterName",
+            value=cluster.cluster_name,
+            description="ECS cluster name"
         )
 
-        CfnOutput(
-            self, "S3BucketName",
-            value=s3_bucket.bucket_name,
-            description="S3 bucket for reports and artifacts"
+    def _add_proxy_method(self, resource: apigateway.Resource, http_method: str,
+                          nlb: elbv2.NetworkLoadBalancer, vpc_link: apigateway.VpcLink,
+                          **method_options) -> apigateway.Method:
+        """Proxy a method to the same path on the backend through the VPC Link"""
+        integration = apigateway.Integration(
+            type=apigateway.IntegrationType.HTTP_PROXY,
+            integration_http_method=http_method,
+            uri=f"http://{nlb.load_balancer_dns_name}{resource.path}",
+            options=apigateway.IntegrationOptions(
+                connection_type=apigateway.ConnectionType.VPC_LINK,
+                vpc_link=vpc_link
+            )
         )
 
-        CfnOutput(
-            self, "ECSClusterName",
-            value=cluster.cluster_name,
-            description="ECS cluster name"
+        return resource.add_method(
+            http_method,
+            integration=integration,
+            authorization_type=apigateway.AuthorizationType.NONE,
+            **method_options
         )
 
     def _create_execution_role(self, s3_bucket: s3.Bucket, log_group: logs.LogGroup) -> iam.Role:
@@ -324,7 +614,8 @@ class ImpactAnalyzerStack(Stack):
 
         return role
 
-    def _create_task_role(self, s3_bucket: s3.Bucket, database: rds.DatabaseInstance) -> iam.Role:
+    def _create_task_role(self, s3_bucket: s3.Bucket, database: rds.DatabaseInstance,
+                          log_group: logs.LogGroup) -> iam.Role:
         """Create ECS task role"""
         role = iam.Role(
             self, "ImpactAnalyzerTaskRole",
@@ -334,52 +625,43 @@ class ImpactAnalyzerStack(Stack):
         # S3 permissions
         s3_bucket.grant_read_write(role)
 
-        # CloudWatch permissions
+        # CloudWatch permissions (PutMetricData has no resource-level scoping,
+        # so it is limited to the application's namespace instead)
         role.add_to_policy(
             iam.PolicyStatement(
                 effect=iam.Effect.ALLOW,
-                actions=[
-                    "cloudwatch:PutMetricData",
-                    "logs:CreateLogStream",
-                    "logs:PutLogEvents"
-                ],
-                resources=["*"]
+                actions=["cloudwatch:PutMetricData"],
+                resources=["*"],
+                conditions={
+                    "StringEquals": {"cloudwatch:namespace": "ImpactAnalyzer"}
+                }
             )
         )
 
-        return role
-
-    def _create_service_security_group(self, vpc: ec2.Vpc) -> ec2.SecurityGroup:
-        """Create security group for ECS service"""
-        security_group = ec2.SecurityGroup(
-            self, "ECSServiceSecurityGroup",
-            vpc=vpc,
-            description="Security group for ECS service",
-            allow_all_outbound=True
-        )
-
-        security_group.add_ingress_rule(
-            peer=ec2.Peer.any_ipv4(),
-            connection=ec2.Port.tcp(8000),
-            description="Allow HTTP access to backend service"
-        )
+        # CloudWatch Logs permissions on the application log group only
+        log_group.grant(role, "logs:CreateLogStream", "logs:PutLogEvents")
 
-        return security_group
+        return role
 
 
 def main():
     app = cdk.App()
     
-    ImpactAnalyzerStack(
-        app, "ImpactAnalyzerStack",
-        env=cdk.Environment(
-            account=app.node.try_get_context("account"),
-            region=app.node.try_get_context("region") or "us-east-1"
-        )
+    env = cdk.Environment(
+        account=app.node.try_get_context("account"),
+        region=app.node.try_get_context("region") or "us-east-1"
     )
     
+    # Layered stacks: service-only changes can be deployed on their own with
+    # `cdk deploy ImpactAnalyzerServiceStack` (or `cdk --app cdk.out deploy ...`)
+    network = NetworkStack(app, "ImpactAnalyzerNetworkStack", env=env)
+    data = DataStack(app, "ImpactAnalyzerDataStack", network=network, env=env)
+    service = ServiceStack(app, "ImpactAnalyzerServiceStack", network=network, data=data, env=env)
+    data.add_dependency(network)
+    service.add_dependency(data)
+    
     app.synth()
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file